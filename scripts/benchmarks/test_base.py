@@ -1,13 +1,26 @@
-from dataclasses import dataclass
 from abc import ABC
+from dataclasses import dataclass
+from typing import NamedTuple
+import numpy as np
 from config import Config
 
-@dataclass
-class TestQuery:
+class TestQuery(NamedTuple):
     chromosome: int
     start: int
     end: int
 
+# Samples are passed to the tests as three parallel int64 arrays instead of a
+# list of TestQuery objects, so the hot loops index plain contiguous arrays
+# instead of chasing pointers to boxed ints.
+@dataclass
+class Samples:
+    chromosome: np.ndarray
+    start: np.ndarray
+    end: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.chromosome)
+
 class Test(ABC):
     def __init__(self, config: Config, name: str):
         self.config = config
@@ -19,5 +32,5 @@ class Test(ABC):
     def setup(self):
         pass
 
-    def run(self, queries: list[TestQuery], duration: float):
+    def run(self, queries: Samples, duration: float):
         pass